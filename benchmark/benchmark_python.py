@@ -9,13 +9,23 @@ This script measures the performance of key operations:
 Run with: python3 benchmark/benchmark_python.py
 """
 
-import sys
+import gc
+import itertools
 import os
+import statistics
+import sys
 import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; max RSS is then skipped
+    resource = None
 
 # Add SoCo to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'SoCo'))
 
+import lxml.etree as ET
 from soco.data_structures_entry import from_didl_string
 from soco.data_structures import (
     DidlMusicTrack,
@@ -55,39 +65,102 @@ COMPLEX_DIDL = '''<DIDL-Lite xmlns:dc="http://purl.org/dc/elements/1.1/"
   </container>
 </DIDL-Lite>'''
 
+# First <item> of SIMPLE_DIDL, parsed once for the from_element benchmark
+SIMPLE_ELEMENT = ET.fromstring(SIMPLE_DIDL)[0]
+
+
+def max_rss_kib():
+    """Return the process's peak resident set size in KiB, or None."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
 
-def benchmark(name, operation, iterations=1000, warmup_iterations=100):
-    """Run a benchmark and print results."""
+def benchmark(name, operation, iterations=1000, warmup_iterations=100,
+              repeat=7):
+    """Run a benchmark and print results.
+
+    The iterations are split as evenly as possible across ``repeat``
+    sub-runs timed with ``perf_counter_ns``. The average over all
+    iterations is reported like benchmark.dart does, alongside the fastest
+    (min) and median sub-run. Throughput comes from the average, so it
+    compares directly with the Dart figures. Peak traced allocation is
+    measured in a separate pass so tracemalloc overhead stays out of the
+    timings.
+    """
+    rss_before = max_rss_kib()
+    
     # Warmup
-    for _ in range(warmup_iterations):
+    for _ in itertools.repeat(None, warmup_iterations):
         operation()
     
-    # Actual benchmark
-    start_time = time.perf_counter()
-    for _ in range(iterations):
-        operation()
-    end_time = time.perf_counter()
+    # Actual benchmark, with GC pauses and thread switches kept out of the
+    # timed region (as timeit does)
+    repeat = max(1, min(repeat, iterations))
+    base, extra = divmod(iterations, repeat)
+    run_sizes = [base + 1] * extra + [base] * (repeat - extra)
+    run_ns = []
+    switch_interval = sys.getswitchinterval()
+    gc.collect()
+    gc.disable()
+    sys.setswitchinterval(10.0)
+    try:
+        for run_size in run_sizes:
+            start_ns = time.perf_counter_ns()
+            for _ in itertools.repeat(None, run_size):
+                operation()
+            run_ns.append(time.perf_counter_ns() - start_ns)
+    finally:
+        sys.setswitchinterval(switch_interval)
+        gc.enable()
     
-    total_ms = (end_time - start_time) * 1000
-    avg_ms = total_ms / iterations
-    ops_per_sec = int(iterations / (end_time - start_time))
+    # Memory: peak Python allocation over one sub-run's worth of calls.
+    # Tracing is only switched on here since it slows every allocation.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _ in itertools.repeat(None, base):
+            operation()
+        peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+    rss_after = max_rss_kib()
+    
+    total_ns = sum(run_ns)
+    per_op_ns = [ns / size for ns, size in zip(run_ns, run_sizes)]
+    total_ms = total_ns / 1e6
+    avg_ms = total_ns / iterations / 1e6
+    min_ms = min(per_op_ns) / 1e6
+    median_ms = statistics.median(per_op_ns) / 1e6
+    ops_per_sec = int(iterations * 1e9 / max(1, total_ns))
     
     print(f'{name}:')
-    print(f'  Total: {total_ms:.2f}ms')
+    print(f'  Total: {total_ms:.2f}ms '
+          f'({iterations} iterations in {repeat} runs)')
     print(f'  Average: {avg_ms:.3f}ms per operation')
+    print(f'  Min: {min_ms:.4f}ms per operation')
+    print(f'  Median: {median_ms:.4f}ms per operation')
     print(f'  Throughput: {ops_per_sec} ops/sec')
+    print(f'  Peak alloc: {peak_kib:.1f} KiB ({base} iterations)')
+    if rss_before is not None:
+        print(f'  Max RSS growth: {rss_after - rss_before} KiB')
 
 
 def main():
     print('Python SoCo Performance Benchmarks\n')
     print('=' * 50)
     
+    # Operations bind globals as lambda defaults (as timeit does) so each
+    # call reads fast locals rather than going through LOAD_GLOBAL.
+
     # Benchmark 1: Simple DIDL parsing
     print('\n1. Simple DIDL Parsing (from_didl_string)')
     print('-' * 50)
     benchmark(
         'Parse simple DIDL (1000 iterations)',
-        lambda: from_didl_string(SIMPLE_DIDL),
+        lambda _p=from_didl_string, _d=SIMPLE_DIDL: _p(_d),
         iterations=1000,
     )
     
@@ -96,7 +169,7 @@ def main():
     print('-' * 50)
     benchmark(
         'Parse complex DIDL (1000 iterations)',
-        lambda: from_didl_string(COMPLEX_DIDL),
+        lambda _p=from_didl_string, _d=COMPLEX_DIDL: _p(_d),
         iterations=1000,
     )
     
@@ -105,16 +178,13 @@ def main():
     print('-' * 50)
     benchmark(
         'Create DidlMusicTrack (10000 iterations)',
-        lambda: DidlMusicTrack(
+        lambda _T=DidlMusicTrack, _R=DidlResource: _T(
             title='Test Track',
             parent_id='0',
             item_id='1',
             restricted=True,
             resources=[
-                DidlResource(
-                    uri='http://example.com/track.mp3',
-                    protocol_info='http-get:*:audio/mpeg:*',
-                ),
+                _R('http://example.com/track.mp3', 'http-get:*:audio/mpeg:*'),
             ],
             artist='Test Artist',
             album='Test Album',
@@ -128,7 +198,7 @@ def main():
     parsed_objects = from_didl_string(COMPLEX_DIDL)
     benchmark(
         'Convert DIDL objects to string (1000 iterations)',
-        lambda: to_didl_string(*parsed_objects),
+        lambda _s=to_didl_string, _o=parsed_objects: _s(*_o),
         iterations=1000,
     )
     
@@ -137,24 +207,37 @@ def main():
     print('-' * 50)
     benchmark(
         'Parse -> Serialize round-trip (500 iterations)',
-        lambda: to_didl_string(*from_didl_string(COMPLEX_DIDL)),
+        lambda _p=from_didl_string, _s=to_didl_string, _d=COMPLEX_DIDL: (
+            _s(*_p(_d))
+        ),
         iterations=500,
     )
     
     # Benchmark 6: from_element performance
     print('\n6. from_element Performance')
     print('-' * 50)
-    import lxml.etree as ET
-    parsed = from_didl_string(SIMPLE_DIDL)
-    if parsed:
-        # Get the XML element from the parsed object
-        doc = ET.fromstring(SIMPLE_DIDL.encode('utf-8'))
-        element = doc[0]  # First child element
-        benchmark(
-            'Create DidlObject from XML element (5000 iterations)',
-            lambda: DidlMusicTrack.from_element(element),
-            iterations=5000,
-        )
+    benchmark(
+        'Create DidlObject from XML element (5000 iterations)',
+        lambda _f=DidlMusicTrack.from_element, _e=SIMPLE_ELEMENT: _f(_e),
+        iterations=5000,
+    )
+    
+    # Benchmark 7: Serialize a cached parse (Python only). Unlike 4, this
+    # compares unpacking the same objects from a list and from a tuple.
+    print('\n7. Serialize Cached Parse (list vs tuple)')
+    print('-' * 50)
+    parsed_cached = from_didl_string(COMPLEX_DIDL)
+    benchmark(
+        'Serialize cached list (500 iterations)',
+        lambda _s=to_didl_string, _o=parsed_cached: _s(*_o),
+        iterations=500,
+    )
+    parsed_tuple = tuple(parsed_cached)
+    benchmark(
+        'Serialize cached tuple (500 iterations)',
+        lambda _s=to_didl_string, _o=parsed_tuple: _s(*_o),
+        iterations=500,
+    )
     
     print('\n' + '=' * 50)
     print('Benchmarks completed!')
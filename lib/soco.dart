@@ -49,7 +49,7 @@ export 'src/data_structures.dart'
         DidlPlaylistContainer,
         DidlAudioBroadcast,
         SearchResult;
-export 'src/data_structures_entry.dart' show fromDidlString;
+export 'src/data_structures_entry.dart' show fromDidlString, fromDidlStream;
 
 // Music library and zone state
 export 'src/music_library.dart' show MusicLibrary;
@@ -8,6 +8,7 @@
 library;
 
 import 'package:logging/logging.dart';
+import 'package:meta/meta.dart';
 import 'package:xml/xml.dart';
 
 import 'data_structure_quirks.dart';
@@ -55,6 +56,37 @@ const Set<String> officialClasses = {
   'object.container.musicGenre',
 };
 
+/// Namespace URIs of the `dc:` and `upnp:` DIDL child elements.
+///
+/// Consts mirroring [soco_xml.namespaces], which can't be read in a const
+/// expression.
+const String _dcNamespace = 'http://purl.org/dc/elements/1.1/';
+const String _upnpNamespace = 'urn:schemas-upnp-org:metadata-1-0/upnp/';
+
+/// Namespace declarations for the `<DIDL-Lite>` root element.
+///
+/// Shared by every [toDidlString] call rather than rebuilt per call.
+const Map<String, String> _didlNamespaces = {
+  '': 'urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/',
+  'dc': _dcNamespace,
+  'upnp': _upnpNamespace,
+  'r': 'urn:schemas-rinconnetworks-com:metadata-1-0/',
+};
+
+/// Qualified tag names written for every DIDL object, built once as consts
+/// instead of looked up through [soco_xml.nsTag] on each call.
+const String _dcTitleTag = '{$_dcNamespace}title';
+const String _upnpClassTag = '{$_upnpNamespace}class';
+
+/// Separators music services use to sub-class DIDL classes (`.#` or `#`).
+const List<String> _subclassSeparators = ['.#', '#'];
+
+/// Attributes of the `<desc>` element written by [DidlObject.toElement].
+const Map<String, String> _descAttributes = {
+  'id': 'cdudn',
+  'nameSpace': 'urn:schemas-rinconnetworks-com:metadata-1-0/',
+};
+
 ///////////////////////////////////////////////////////////////////////////////
 // MISC HELPER FUNCTIONS                                                     //
 ///////////////////////////////////////////////////////////////////////////////
@@ -68,23 +100,63 @@ const Set<String> officialClasses = {
 ///   A unicode string representation of DIDL-Lite XML in the form
 ///   `<DIDL-Lite ...>...</DIDL-Lite>`
 String toDidlString(List<DidlObject> objects) {
+  if (objects.isEmpty) {
+    // An empty element is self-closing, as XmlBuilder renders it
+    return '${_didlOpenTag.substring(0, _didlOpenTag.length - 1)}/>';
+  }
+
+  // Write the markup directly instead of building an XML node tree first
+  final buffer = StringBuffer(_didlOpenTag);
+  for (final obj in objects) {
+    obj._writeXml(buffer);
+  }
+  buffer.write(_didlCloseTag);
+  return buffer.toString();
+}
+
+/// Closing tag of the DIDL-Lite root element.
+const String _didlCloseTag = '</DIDL-Lite>';
+
+/// Opening tag of the DIDL-Lite root element, namespace declarations included.
+///
+/// Rendered once through [XmlBuilder] so that [toDidlString] produces exactly
+/// the markup the builder would.
+final String _didlOpenTag = () {
   final builder = XmlBuilder();
   builder.element(
     'DIDL-Lite',
-    namespaces: {
-      '': 'urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/',
-      'dc': 'http://purl.org/dc/elements/1.1/',
-      'upnp': 'urn:schemas-upnp-org:metadata-1-0/upnp/',
-      'r': 'urn:schemas-rinconnetworks-com:metadata-1-0/',
-    },
-    nest: () {
-      for (final obj in objects) {
-        builder.element(obj.tag, nest: () => obj.toElement(builder));
-      }
-    },
+    namespaces: _didlNamespaces,
+    nest: () => builder.text(''),
   );
+  final xml = builder.buildDocument().toXmlString();
+  return xml.substring(0, xml.length - _didlCloseTag.length);
+}();
+
+/// Write ` name="value"` with the value escaped as [XmlBuilder] would.
+void _writeXmlAttribute(StringSink sink, String name, String value) {
+  sink
+    ..write(' ')
+    ..write(name)
+    ..write('="')
+    ..write(
+      defaultEntityMapping.encodeAttributeValue(
+        value,
+        XmlAttributeType.DOUBLE_QUOTE,
+      ),
+    )
+    ..write('"');
+}
 
-  return builder.buildDocument().toXmlString();
+/// Write `<name>text</name>` with the text escaped as [XmlBuilder] would.
+void _writeXmlTextElement(StringSink sink, String name, String text) {
+  sink
+    ..write('<')
+    ..write(name)
+    ..write('>')
+    ..write(defaultEntityMapping.encodeText(text))
+    ..write('</')
+    ..write(name)
+    ..write('>');
 }
 
 /// Translate a DIDL-Lite class to the corresponding SoCo data structures class.
@@ -94,7 +166,7 @@ String toDidlString(List<DidlObject> objects) {
 Type didlClassToSoCoClass(String didlClass) {
   // Certain music services have been observed to sub-class via a .# or # syntax.
   // We simply remove these subclasses.
-  for (final separator in ['.#', '#']) {
+  for (final separator in _subclassSeparators) {
     if (didlClass.contains(separator)) {
       didlClass = didlClass.substring(0, didlClass.indexOf(separator));
     }
@@ -358,7 +430,7 @@ DidlObject Function({
 })?
 getDidlClassFactory(String didlClass) {
   // Clean up the class name
-  for (final separator in ['.#', '#']) {
+  for (final separator in _subclassSeparators) {
     if (didlClass.contains(separator)) {
       didlClass = didlClass.substring(0, didlClass.indexOf(separator));
     }
@@ -466,19 +538,6 @@ class DidlResource {
 
   /// Create a DidlResource from an XML element.
   factory DidlResource.fromElement(XmlElement element) {
-    // Helper to convert attribute to int
-    int? intHelper(String name) {
-      final value = element.getAttribute(name);
-      if (value != null) {
-        try {
-          return int.parse(value);
-        } catch (e) {
-          throw DIDLMetadataError('Could not convert $name to an integer');
-        }
-      }
-      return null;
-    }
-
     // Apply quirks
     final fixed = applyResourceQuirks(element);
 
@@ -494,22 +553,42 @@ class DidlResource {
       uri: fixed.innerText,
       protocolInfo: protocolInfo,
       importUri: fixed.getAttribute('importUri'),
-      size: intHelper('size'),
+      size: _intAttribute(element, 'size'),
       duration: fixed.getAttribute('duration'),
-      bitrate: intHelper('bitrate'),
-      sampleFrequency: intHelper('sampleFrequency'),
-      bitsPerSample: intHelper('bitsPerSample'),
-      nrAudioChannels: intHelper('nrAudioChannels'),
+      bitrate: _intAttribute(element, 'bitrate'),
+      sampleFrequency: _intAttribute(element, 'sampleFrequency'),
+      bitsPerSample: _intAttribute(element, 'bitsPerSample'),
+      nrAudioChannels: _intAttribute(element, 'nrAudioChannels'),
       resolution: fixed.getAttribute('resolution'),
-      colorDepth: intHelper('colorDepth'),
+      colorDepth: _intAttribute(element, 'colorDepth'),
       protection: fixed.getAttribute('protection'),
     );
   }
 
+  /// Read the integer attribute [name] of [element], or null if absent.
+  ///
+  /// A static helper rather than a closure in [DidlResource.fromElement], so
+  /// no closure is allocated for every parsed resource.
+  static int? _intAttribute(XmlElement element, String name) {
+    final value = element.getAttribute(name);
+    if (value != null) {
+      try {
+        return int.parse(value);
+      } catch (e) {
+        throw DIDLMetadataError('Could not convert $name to an integer');
+      }
+    }
+    return null;
+  }
+
   /// Build this resource directly into an XmlBuilder (more efficient).
   ///
   /// This method is more efficient than [toElement] when building XML
   /// as it avoids creating intermediate XmlElement objects.
+  ///
+  /// [toDidlString] writes resources through `_writeXml` instead, which must
+  /// be kept producing the same markup as this method.
+  @nonVirtual
   void toElementInBuilder(XmlBuilder builder) {
     builder.element(
       'res',
@@ -543,6 +622,36 @@ class DidlResource {
     );
   }
 
+  /// Write this resource as a `<res>` element, matching [toElementInBuilder].
+  void _writeXml(StringSink sink) {
+    sink.write('<res');
+    _writeXmlAttribute(sink, 'protocolInfo', protocolInfo);
+    if (importUri != null) _writeXmlAttribute(sink, 'importUri', importUri!);
+    if (size != null) _writeXmlAttribute(sink, 'size', size.toString());
+    if (duration != null) _writeXmlAttribute(sink, 'duration', duration!);
+    if (bitrate != null) {
+      _writeXmlAttribute(sink, 'bitrate', bitrate.toString());
+    }
+    if (sampleFrequency != null) {
+      _writeXmlAttribute(sink, 'sampleFrequency', sampleFrequency.toString());
+    }
+    if (bitsPerSample != null) {
+      _writeXmlAttribute(sink, 'bitsPerSample', bitsPerSample.toString());
+    }
+    if (nrAudioChannels != null) {
+      _writeXmlAttribute(sink, 'nrAudioChannels', nrAudioChannels.toString());
+    }
+    if (resolution != null) _writeXmlAttribute(sink, 'resolution', resolution!);
+    if (colorDepth != null) {
+      _writeXmlAttribute(sink, 'colorDepth', colorDepth.toString());
+    }
+    if (protection != null) _writeXmlAttribute(sink, 'protection', protection!);
+    sink
+      ..write('>')
+      ..write(defaultEntityMapping.encodeText(uri))
+      ..write('</res>');
+  }
+
   /// Return an XML Element based on this resource.
   ///
   /// For better performance when building XML, use [toElementInBuilder] instead.
@@ -599,8 +708,8 @@ class DidlObject {
   /// Subclasses should override this to return their static itemClass when no override is set
   String get effectiveItemClass => _itemClassOverride ?? itemClass;
 
-  /// The XML element tag name used for this instance
-  String tag = 'item';
+  /// The XML element tag name used for this class
+  String get tag => 'item';
 
   /// The title for the item
   final String title;
@@ -629,21 +738,30 @@ class DidlObject {
     'write_status': ['upnp', 'writeStatus'],
   };
 
-  /// Pre-computed lookup keys for translation entries (optimization)
-  /// Maps metadata key -> 'namespaceUri:localName' for fast element lookup
-  static final Map<String, String> _translationLookupKeys =
-      _buildTranslationLookupKeys();
+  /// Pre-computed reverse lookup for translation entries (optimization)
+  /// Maps namespaceUri -> localName -> metadata key, so child elements can be
+  /// matched without building a combined key string for each one
+  static final Map<String, Map<String, String>> _translationKeysByTag =
+      _buildTranslationKeysByTag();
 
-  static Map<String, String> _buildTranslationLookupKeys() {
-    final keys = <String, String>{};
+  static Map<String, Map<String, String>> _buildTranslationKeysByTag() {
+    final keys = <String, Map<String, String>>{};
     for (final entry in translation.entries) {
       final tagInfo = entry.value;
-      final namespaceUri = soco_xml.namespaces[tagInfo[0]];
-      keys[entry.key] = '$namespaceUri:${tagInfo[1]}';
+      final namespaceUri = soco_xml.namespaces[tagInfo[0]]!;
+      keys.putIfAbsent(namespaceUri, () => {})[tagInfo[1]] = entry.key;
     }
     return keys;
   }
 
+  /// Qualified tag name for each translation entry (optimization)
+  /// Maps metadata key -> '{namespaceUri}localName', built once so
+  /// serialization doesn't resolve the tag for every metadata value
+  static final Map<String, String> _translationTags = {
+    for (final entry in translation.entries)
+      entry.key: soco_xml.nsTag(entry.value[0], entry.value[1]),
+  };
+
   /// Creates a DIDL object.
   DidlObject({
     required this.title,
@@ -688,7 +806,7 @@ class DidlObject {
 
     // Find the upnp:class element
     final itemClassElement = element
-        .findElements('class', namespace: soco_xml.namespaces['upnp'])
+        .findElements('class', namespace: _upnpNamespace)
         .firstOrNull;
 
     if (itemClassElement == null) {
@@ -698,7 +816,7 @@ class DidlObject {
     var itemClass = itemClassElement.innerText;
 
     // Strip subclass syntax (.# or #)
-    for (final separator in ['.#', '#']) {
+    for (final separator in _subclassSeparators) {
       if (itemClass.contains(separator)) {
         itemClass = itemClass.substring(0, itemClass.indexOf(separator));
       }
@@ -954,19 +1072,18 @@ class DidlObject {
         (restrictedAttr != '0' && restrictedAttr.toLowerCase() != 'false');
 
     // Optimize: collect child elements once for multiple lookups
-    // Only build map if we have translation entries to process
-    final needsMetadataLookup = translation.isNotEmpty;
-    final childElements = needsMetadataLookup ? <String, XmlElement>{} : null;
     XmlElement? titleEl;
     XmlElement? descEl;
     final resElements = <XmlElement>[];
+    // First element found for each translated metadata key
+    final translatedEls = <String, XmlElement>{};
 
     for (final child in element.childElements) {
       final localName = child.name.local;
       final namespaceUri = child.name.namespaceUri;
 
       // Track specific elements we need
-      if (localName == 'title' && namespaceUri == soco_xml.namespaces['dc']) {
+      if (localName == 'title' && namespaceUri == _dcNamespace) {
         titleEl = child;
       } else if (localName == 'desc') {
         descEl = child;
@@ -974,12 +1091,10 @@ class DidlObject {
         resElements.add(child);
       }
 
-      // Store for metadata lookup if needed
-      if (needsMetadataLookup) {
-        final key = '$namespaceUri:$localName';
-        if (!childElements!.containsKey(key)) {
-          childElements[key] = child;
-        }
+      // Match translated metadata elements by namespace, then local name
+      final metadataKey = _translationKeysByTag[namespaceUri]?[localName];
+      if (metadataKey != null) {
+        translatedEls[metadataKey] ??= child;
       }
     }
 
@@ -1010,45 +1125,18 @@ class DidlObject {
       desc = {'RINCON_AssociatedZPUDN': descEl.innerText};
     }
 
-    // Extract translated metadata elements
-    // Use optimized lookup: map if available, otherwise direct findElements
+    // Extract translated metadata elements, in translation order
     final metadata = <String, dynamic>{};
-    if (needsMetadataLookup && childElements != null) {
-      // Fast path: use pre-built map with pre-computed lookup keys
-      for (final entry in translation.entries) {
-        final lookupKey = _translationLookupKeys[entry.key];
-        if (lookupKey == null) continue;
-        final valueEl = childElements[lookupKey];
-        if (valueEl != null) {
-          final value = valueEl.innerText;
-          if (value.isNotEmpty) {
-            // Convert original_track_number to int if present
-            if (entry.key == 'original_track_number') {
-              metadata[entry.key] = int.tryParse(value) ?? value;
-            } else {
-              metadata[entry.key] = value;
-            }
-          }
-        }
-      }
-    } else if (needsMetadataLookup) {
-      // Fallback: direct lookup (shouldn't happen, but safe)
-      for (final entry in translation.entries) {
-        final tagInfo = entry.value;
-        final valueEl = element
-            .findElements(
-              tagInfo[1],
-              namespace: soco_xml.namespaces[tagInfo[0]],
-            )
-            .firstOrNull;
-        if (valueEl != null) {
-          final value = valueEl.innerText;
-          if (value.isNotEmpty) {
-            if (entry.key == 'original_track_number') {
-              metadata[entry.key] = int.tryParse(value) ?? value;
-            } else {
-              metadata[entry.key] = value;
-            }
+    for (final key in translation.keys) {
+      final valueEl = translatedEls[key];
+      if (valueEl != null) {
+        final value = valueEl.innerText;
+        if (value.isNotEmpty) {
+          // Convert original_track_number to int if present
+          if (key == 'original_track_number') {
+            metadata[key] = int.tryParse(value) ?? value;
+          } else {
+            metadata[key] = value;
           }
         }
       }
@@ -1058,6 +1146,12 @@ class DidlObject {
   }
 
   /// Build XML element content.
+  ///
+  /// [toDidlString] does not call this method: it writes the same markup
+  /// straight to a string through `_writeXml`, which must be kept in step
+  /// with any change made here. Overriding would only affect callers that
+  /// build with an [XmlBuilder] themselves, so the method is not virtual.
+  @nonVirtual
   void toElement(XmlBuilder builder) {
     // Add attributes
     builder.attribute('id', itemId);
@@ -1065,17 +1159,17 @@ class DidlObject {
     // Optimize: use const strings instead of toString()
     builder.attribute('restricted', restricted ? 'true' : 'false');
 
-    // Title - use pre-computed nsTag
+    // Title - use const tag
     builder.element(
-      soco_xml.nsTag('dc', 'title'),
+      _dcTitleTag,
       nest: () {
         builder.text(title);
       },
     );
 
-    // Class - use pre-computed nsTag
+    // Class - use const tag
     builder.element(
-      soco_xml.nsTag('upnp', 'class'),
+      _upnpClassTag,
       nest: () {
         builder.text(effectiveItemClass);
       },
@@ -1090,10 +1184,7 @@ class DidlObject {
     if (desc.isNotEmpty) {
       builder.element(
         'desc',
-        attributes: {
-          'id': 'cdudn',
-          'nameSpace': 'urn:schemas-rinconnetworks-com:metadata-1-0/',
-        },
+        attributes: _descAttributes,
         nest: () {
           builder.text(desc);
         },
@@ -1102,10 +1193,10 @@ class DidlObject {
 
     // Add extra metadata
     for (final entry in _metadata.entries) {
-      if (translation.containsKey(entry.key)) {
-        final tagInfo = translation[entry.key]!;
+      final metadataTag = _translationTags[entry.key];
+      if (metadataTag != null) {
         builder.element(
-          soco_xml.nsTag(tagInfo[0], tagInfo[1]),
+          metadataTag,
           nest: () {
             builder.text(entry.value.toString());
           },
@@ -1114,6 +1205,50 @@ class DidlObject {
     }
   }
 
+  /// Write this object as a complete `<item>` or `<container>` element.
+  ///
+  /// Produces the same markup as [toElement] nested in a [tag] element, but
+  /// writes it straight to [sink]. Used by [toDidlString].
+  void _writeXml(StringSink sink) {
+    sink
+      ..write('<')
+      ..write(tag);
+    _writeXmlAttribute(sink, 'id', itemId);
+    _writeXmlAttribute(sink, 'parentID', parentId);
+    _writeXmlAttribute(sink, 'restricted', restricted ? 'true' : 'false');
+    sink.write('>');
+
+    _writeXmlTextElement(sink, _dcTitleTag, title);
+    _writeXmlTextElement(sink, _upnpClassTag, effectiveItemClass);
+
+    for (final resource in resources) {
+      resource._writeXml(sink);
+    }
+
+    if (desc.isNotEmpty) {
+      sink.write('<desc');
+      for (final attribute in _descAttributes.entries) {
+        _writeXmlAttribute(sink, attribute.key, attribute.value);
+      }
+      sink
+        ..write('>')
+        ..write(defaultEntityMapping.encodeText(desc))
+        ..write('</desc>');
+    }
+
+    for (final entry in _metadata.entries) {
+      final metadataTag = _translationTags[entry.key];
+      if (metadataTag != null) {
+        _writeXmlTextElement(sink, metadataTag, entry.value.toString());
+      }
+    }
+
+    sink
+      ..write('</')
+      ..write(tag)
+      ..write('>');
+  }
+
   @override
   String toString() {
     return '<${runtimeType.toString()} \'$title\' at ${hashCode.toRadixString(16)}>';
@@ -1255,9 +1390,10 @@ class DidlContainer extends DidlObject {
     super.desc,
     super.metadata,
     super.itemClassOverride,
-  }) {
-    tag = 'container';
-  }
+  });
+
+  @override
+  String get tag => 'container';
 
   @override
   String get effectiveItemClass => _itemClassOverride ?? itemClass;
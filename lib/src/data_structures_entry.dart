@@ -4,6 +4,7 @@ library;
 
 import 'package:logging/logging.dart';
 import 'package:xml/xml.dart';
+import 'package:xml/xml_events.dart';
 
 import 'data_structures.dart';
 import 'exceptions.dart';
@@ -19,6 +20,15 @@ typedef DidlClassToSoCoClass = Type Function(String);
 /// Set this from data_structures.dart after import
 DidlClassToSoCoClass? didlClassToSoCoClass;
 
+// Characters XML 1.0 forbids outright: C0 controls other than tab, LF and
+// CR, plus U+FFFE and U+FFFF. fromDidlStream strips them from each chunk.
+// Discouraged but legal characters (C1 controls, noncharacters) are kept,
+// and so are surrogates, as a chunk can't tell a lone surrogate from half
+// of a valid pair (e.g. emoji)
+final RegExp _forbiddenXmlCharRe = RegExp(
+  r'[\x00-\x08\x0B\x0C\x0E-\x1F\uFFFE\uFFFF]',
+);
+
 // Cache for fromDidlString results
 // Using hash codes as keys for better performance (avoids storing full strings)
 final Map<int, List<DidlObject>> _fromDidlStringCache = {};
@@ -102,6 +112,105 @@ List<DidlObject> fromDidlString(String string) {
   return items;
 }
 
+/// Convert a stream of XML text to a stream of DidlObjects.
+///
+/// Unlike [fromDidlString], the document is never held in memory as a whole.
+/// Each top-level `<item>` or `<container>` is assembled on its own, converted
+/// with [DidlObject.fromElement] and released before the next one is read, so
+/// memory use stays flat for large payloads such as full queue listings.
+/// Results are not cached.
+///
+/// [fromDidlString] only strips illegal characters after a failed parse, but
+/// a stream cannot be re-read, so the characters XML 1.0 forbids outright
+/// (C0 controls other than tab, LF and CR, U+FFFE and U+FFFF) are removed
+/// from every chunk before parsing. All other text, including C1 controls,
+/// is passed through exactly as [fromDidlString] would keep it. Unpaired
+/// surrogates are not stripped and make the stream fail with an
+/// [XmlException].
+///
+/// Parameters:
+///   - [input]: Chunks of a unicode string containing an XML representation
+///     of one or more DIDL-Lite items (in the form
+///     `<DIDL-Lite ...>...</DIDL-Lite>`)
+///
+/// Returns:
+///   A stream of instances of DidlObject or a subclass, in document order
+///
+/// Throws:
+///   - [DIDLMetadataError] if the XML contains illegal elements
+///   - [XmlException] if the XML is not well-formed
+Stream<DidlObject> fromDidlStream(Stream<String> input) async* {
+  // Childless copy of <DIDL-Lite>; items are attached to it one at a time so
+  // that their namespace prefixes resolve against its declarations
+  XmlElement? root;
+  // Events of the item currently being read, or null between items
+  List<XmlEvent>? itemEvents;
+  var depth = 0;
+
+  final eventChunks = input
+      .map((chunk) => chunk.replaceAll(_forbiddenXmlCharRe, ''))
+      .toXmlEvents(validateNesting: true, validateDocument: true)
+      .normalizeEvents();
+  await for (final events in eventChunks) {
+    for (final event in events) {
+      if (event is XmlStartElementEvent) {
+        if (depth == 0) {
+          root = XmlElement(
+            XmlName.fromString(event.name),
+            event.attributes.map(
+              (attribute) => XmlAttribute(
+                XmlName.fromString(attribute.name),
+                attribute.value,
+                attribute.attributeType,
+              ),
+            ),
+          );
+        } else if (depth == 1) {
+          final tag = event.localName;
+          if (tag != 'item' && tag != 'container') {
+            throw DIDLMetadataError('Illegal child of DIDL element: <$tag>');
+          }
+          itemEvents = [];
+        }
+        itemEvents?.add(event);
+        if (!event.isSelfClosing) {
+          depth++;
+        } else if (depth == 1 && itemEvents != null) {
+          yield _fromItemEvents(root!, itemEvents);
+          itemEvents = null;
+        }
+      } else if (event is XmlEndElementEvent) {
+        depth--;
+        itemEvents?.add(event);
+        if (depth == 1 && itemEvents != null) {
+          yield _fromItemEvents(root!, itemEvents);
+          itemEvents = null;
+        }
+      } else {
+        itemEvents?.add(event);
+      }
+    }
+  }
+}
+
+/// Build the DidlObject for one `<item>` or `<container>` from its events.
+DidlObject _fromItemEvents(XmlElement root, List<XmlEvent> events) {
+  if (didlClassToSoCoClass == null) {
+    throw DIDLMetadataError(
+      'didlClassToSoCoClass function not set. Import data_structures.dart first.',
+    );
+  }
+
+  final element = const XmlNodeDecoder().convert(events).single as XmlElement;
+  root.children.add(element);
+  try {
+    return DidlObject.fromElement(element);
+  } finally {
+    // Release the item before the next one is read
+    root.children.clear();
+  }
+}
+
 /// Clear the fromDidlString cache
 void clearFromDidlStringCache() {
   _fromDidlStringCache.clear();
@@ -382,4 +382,100 @@ void main() {
       expect(resource.colorDepth, equals(32));
     });
   });
+
+  group('fromDidlStream', () {
+    const twoItemsXml = '''<DIDL-Lite xmlns:dc="http://purl.org/dc/elements/1.1/"
+           xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/"
+           xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/">
+  <item id="1" parentID="0" restricted="true">
+    <dc:title>Test Track</dc:title>
+    <dc:creator>Test Artist</dc:creator>
+    <upnp:class>object.item.audioItem.musicTrack</upnp:class>
+    <res protocolInfo="http-get:*:audio/mpeg:*">http://example.com/track.mp3</res>
+  </item>
+  <container id="2" parentID="0" restricted="true">
+    <dc:title>Test Album</dc:title>
+    <upnp:class>object.container.album.musicAlbum</upnp:class>
+  </container>
+</DIDL-Lite>''';
+
+    // Split into small chunks so items span chunk boundaries
+    Stream<String> chunked(String xml, [int size = 7]) => Stream.fromIterable([
+      for (var i = 0; i < xml.length; i += size)
+        xml.substring(i, i + size < xml.length ? i + size : xml.length),
+    ]);
+
+    test('yields the same objects as fromDidlString', () async {
+      final xmlString = dataLoader.loadXml('track.xml');
+      final expected = fromDidlString(xmlString);
+
+      final result = await entry.fromDidlStream(chunked(xmlString)).toList();
+
+      expect(result, hasLength(expected.length));
+      expect(result[0], isA<DidlMusicTrack>());
+      expect(result[0].title, equals(expected[0].title));
+      expect(result[0].itemId, equals(expected[0].itemId));
+      expect(result[0]['creator'], equals(expected[0]['creator']));
+      expect(
+        result[0].resources.single.uri,
+        equals(expected[0].resources.single.uri),
+      );
+    }, timeout: Timeout(Duration(seconds: 5)));
+
+    test('yields every item and container in document order', () async {
+      final result = await entry.fromDidlStream(chunked(twoItemsXml)).toList();
+
+      expect(result, hasLength(2));
+      expect(result[0], isA<DidlMusicTrack>());
+      expect(result[0].title, equals('Test Track'));
+      expect(result[0]['creator'], equals('Test Artist'));
+      expect(result[1].tag, equals('container'));
+      expect(result[1].title, equals('Test Album'));
+    }, timeout: Timeout(Duration(seconds: 5)));
+
+    test('keeps legal C1 and noncharacter text like fromDidlString', () async {
+      final xml = twoItemsXml
+          .replaceFirst('Test Track', 'Caf\u00C3\u0083 \u0085\u009F Track')
+          .replaceFirst('Test Album', 'Album \u0080\uFDD0');
+      final expected = fromDidlString(xml);
+
+      final result = await entry.fromDidlStream(chunked(xml)).toList();
+
+      expect(result, hasLength(expected.length));
+      expect(result[0].title, equals(expected[0].title));
+      expect(result[0].title, equals('Caf\u00C3\u0083 \u0085\u009F Track'));
+      expect(result[1].title, equals(expected[1].title));
+      expect(result[1].title, equals('Album \u0080\uFDD0'));
+    }, timeout: Timeout(Duration(seconds: 5)));
+
+    test('strips characters that XML 1.0 forbids', () async {
+      final dirtyXml = twoItemsXml
+          .replaceFirst('Test Track', 'Test\x01 Track\x0B')
+          .replaceFirst('Test Album', '\u{1F3B5} Test Album');
+
+      final result = await entry.fromDidlStream(chunked(dirtyXml)).toList();
+
+      expect(result, hasLength(2));
+      expect(result[0].title, equals('Test Track'));
+      // Surrogate pairs (emoji) are not stripped
+      expect(result[1].title, equals('\u{1F3B5} Test Album'));
+    }, timeout: Timeout(Duration(seconds: 5)));
+
+    test('throws DIDLMetadataError for illegal DIDL child element', () {
+      const invalidXml = '''<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/">
+  <unknownElement>Invalid content</unknownElement>
+</DIDL-Lite>''';
+
+      expect(
+        entry.fromDidlStream(Stream.value(invalidXml)).toList(),
+        throwsA(
+          isA<DIDLMetadataError>().having(
+            (e) => e.message,
+            'message',
+            contains('Illegal child'),
+          ),
+        ),
+      );
+    });
+  });
 }
@@ -719,6 +719,81 @@ void main() {
       expect(result, contains('xmlns'));
       expect(result, contains('urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/'));
     });
+
+    test('matches the XmlBuilder rendering of toElement', () {
+      final objects = <DidlObject>[
+        DidlMusicTrack(
+          title: 'Rock & <Roll>',
+          parentId: '0 & "parent" <p>',
+          itemId: 'Q:0/1 "a" & <b>',
+          desc: 'RINCON & <desc>',
+          resources: [
+            // Every field set, with values that need escaping, so a
+            // missed, misordered or differently escaped attribute fails
+            DidlResource(
+              uri: 'http://example.com/a.mp3?x=1&y=2',
+              protocolInfo: 'http-get:*:"audio/mpeg" & <x>:*',
+              importUri: 'http://example.com/import?a=1&b="2"',
+              size: 1024,
+              duration: '0:03:45',
+              bitrate: 320000,
+              sampleFrequency: 44100,
+              bitsPerSample: 16,
+              nrAudioChannels: 2,
+              resolution: '640x480',
+              colorDepth: 24,
+              protection: "DRM 'x' & <y>",
+            ),
+            DidlResource(
+              uri: 'x-file-cifs://server/share/b.flac',
+              protocolInfo: 'x-file-cifs:*:audio/flac:*',
+              bitrate: 1411200,
+            ),
+          ],
+          metadata: {
+            'creator': 'Artist "Quoted"',
+            'write_status': 'WRITABLE & <ok>',
+            'ignored': 'x',
+          },
+        ),
+        DidlMusicAlbum(
+          title: 'Album',
+          parentId: 'A:ALBUM',
+          itemId: 'A:ALBUM/1',
+          restricted: false,
+          desc: '',
+        ),
+      ];
+
+      final builder = XmlBuilder();
+      builder.element(
+        'DIDL-Lite',
+        namespaces: {
+          '': 'urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/',
+          'dc': 'http://purl.org/dc/elements/1.1/',
+          'upnp': 'urn:schemas-upnp-org:metadata-1-0/upnp/',
+          'r': 'urn:schemas-rinconnetworks-com:metadata-1-0/',
+        },
+        nest: () {
+          for (final obj in objects) {
+            builder.element(obj.tag, nest: () => obj.toElement(builder));
+          }
+        },
+      );
+
+      expect(
+        toDidlString(objects),
+        equals(builder.buildDocument().toXmlString()),
+      );
+    });
+
+    test('renders an empty list as a self-closing element', () {
+      final result = toDidlString([]);
+
+      expect(result, startsWith('<DIDL-Lite '));
+      expect(result, endsWith('/>'));
+      expect(result, isNot(contains('</DIDL-Lite>')));
+    });
   });
 
   group('initializeDidlClasses', () {
@@ -2,135 +2,175 @@
 """
 Script to add timeouts to all async tests in Dart test files.
 This ensures tests don't hang forever.
+
+Optional dependencies (the script falls back to the re module without them):
+- hyperscan: used automatically when installed to find async tests.
+- numba and numpy: set ADD_TIMEOUTS_NUMBA=1 to scan braces with a
+  JIT-compiled loop. Off by default; the numba import costs ~0.4s per
+  process, more than scanning this repo's whole test directory.
+
+    ADD_TIMEOUTS_NUMBA=1 python3 tool/add_all_timeouts.py
 """
 
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    import hyperscan
+except ImportError:  # Optional: DFA matching for bulk runs, else use re
+    hyperscan = None
+
+# Opt-in JIT-compiled brace scan: importing numba costs ~0.4s per process,
+# far more than the re scan of the whole test directory, so it is only
+# worth enabling for very large trees
+numba = None
+if os.environ.get('ADD_TIMEOUTS_NUMBA'):
+    try:
+        import numba
+        import numpy as np
+    except ImportError:  # Fall back to the re scan
+        numba = None
+
 # Default timeout for most tests (5 seconds)
 DEFAULT_TIMEOUT = 5
 # Longer timeout for network/discovery tests (10 seconds)
 NETWORK_TIMEOUT = 10
+# Below this many files per worker, process startup costs more than the
+# scan itself (the whole test directory scans in a few milliseconds)
+MIN_FILES_PER_WORKER = 64
 
-def add_timeout_to_file(file_path: Path, timeout: int = DEFAULT_TIMEOUT):
-    """Add timeout to all async tests in a file that don't already have one."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        original_content = content
-        
-        # Pattern to match: test('...', () async { ... });
-        # We need to find async tests and add timeout before the closing });
-        
-        # Find all async test declarations
-        async_test_pattern = r"test\s*\([^)]+\)\s*async\s*\{"
-        
-        # For each async test, we need to find its closing });
-        # This is tricky because of nested braces, so we'll use a simpler approach:
-        # Find lines that end with }); after an async test and add timeout
-        
-        lines = content.split('\n')
-        modified_lines = []
-        i = 0
-        modified = False
-        
-        while i < len(lines):
-            line = lines[i]
-            modified_lines.append(line)
-            
-            # Check if this line starts an async test
-            if re.search(r"test\s*\([^)]+\)\s*async\s*\{", line):
-                # Look ahead to find the matching closing });
-                brace_count = line.count('{') - line.count('}')
-                j = i + 1
-                
-                # Track the lines we're scanning
-                test_lines = [line]
-                
-                while j < len(lines) and brace_count > 0:
-                    test_lines.append(lines[j])
-                    brace_count += lines[j].count('{') - lines[j].count('}')
-                    j += 1
-                
-                # If we found the closing, check if it needs timeout
-                if j < len(lines) and '});' in lines[j-1]:
-                    closing_line = lines[j-1]
-                    if 'timeout:' not in closing_line and 'Timeout(' not in closing_line:
-                        # Add timeout before the closing });
-                        modified_lines[-1] = closing_line.replace(
-                            '});',
-                            f'}}, timeout: Timeout(Duration(seconds: {timeout})));'
-                        )
-                        modified = True
-                        # Skip the original closing line since we've replaced it
-                        i = j
-                        continue
-            
-            i += 1
-        
-        if modified:
-            new_content = '\n'.join(modified_lines)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            return True
-        
-        return False
-        
-    except Exception as e:
-        print(f"  Error processing {file_path.name}: {e}")
-        return False
+# Start of an async test body: test('...', () async {
+_ASYNC_TEST_PATTERN = rb"test\s*\([^)]+\)\s*async\s*\{"
+_ASYNC_TEST_RE = re.compile(_ASYNC_TEST_PATTERN)
+_BRACE_RE = re.compile(rb'[{}]')
+# Closing of a test call with no further arguments
+_CLOSING_RE = re.compile(rb'\}\);')
+
+def _compile_hyperscan_db():
+    """Compile the async test pattern into a hyperscan block-mode database."""
+    db = hyperscan.Database()
+    db.compile(expressions=[_ASYNC_TEST_PATTERN], ids=[0], flags=[0])
+    return db
+
+_HS_DB = _compile_hyperscan_db() if hyperscan is not None else None
+
+def find_async_test_bodies(raw: bytes):
+    """Return the offsets of the opening brace of every async test body.
+
+    Uses the hyperscan database when available: it reports the end offset
+    of each match, which is one past the opening brace. Otherwise falls
+    back to the compiled re pattern.
+    """
+    if _HS_DB is None:
+        return [match.end() - 1 for match in _ASYNC_TEST_RE.finditer(raw)]
+
+    ends = set()
+
+    def on_match(_id, _start, end, _flags, _context):
+        ends.add(end - 1)
+
+    _HS_DB.scan(raw, match_event_handler=on_match)
+    return sorted(ends)
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _scan_braces(buf, start):
+        """Walk a uint8 array from start, returning the matching '}' or -1."""
+        depth = 0
+        for i in range(start, buf.shape[0]):
+            c = buf[i]
+            if c == 123:  # {
+                depth += 1
+            elif c == 125:  # }
+                depth -= 1
+                if depth == 0:
+                    return i
+        return -1
+
+def brace_buffer(raw: bytes):
+    """Return the buffer find_matching_brace should scan for raw.
+
+    A zero-copy uint8 view for the numba scanner, or raw itself without it.
+    """
+    if numba is None:
+        return raw
+    return np.frombuffer(raw, dtype=np.uint8)
+
+def find_matching_brace(buf, start: int) -> int:
+    """Return the offset of the brace closing the one at start, or -1.
+
+    buf comes from brace_buffer(). With ADD_TIMEOUTS_NUMBA set and numba
+    installed the walk runs as compiled code; otherwise the compiled re
+    pattern steps brace to brace.
+    """
+    if numba is not None:
+        return _scan_braces(buf, start)
+    depth = 0
+    for brace in _BRACE_RE.finditer(buf, start):
+        depth += 1 if brace.group() == b'{' else -1
+        if depth == 0:
+            return brace.start()
+    return -1
+
+def add_timeouts(raw: bytes, timeout: int = DEFAULT_TIMEOUT):
+    """Return raw with a timeout added to every async test, or None.
+
+    The file is scanned once: each async test body is matched to its closing
+    brace by a running brace depth, and the `});` that follows is rewritten.
+    Works on the undecoded bytes so match offsets apply directly.
+    Returns None when no test needed a timeout.
+    """
+    replacement = f'}}, timeout: Timeout(Duration(seconds: {timeout})));'.encode()
+    buf = brace_buffer(raw)
+    pieces = []
+    last = 0
+    for open_brace in find_async_test_bodies(raw):
+        if open_brace < last:
+            # Nested inside a test body that was already handled
+            continue
+        close = find_matching_brace(buf, open_brace)
+        if close < 0:
+            # Unbalanced braces; leave the rest of the file alone
+            break
+        closing = _CLOSING_RE.match(raw, close)
+        if closing:
+            pieces.append(raw[last:close])
+            pieces.append(replacement)
+            last = closing.end()
+    if not pieces:
+        return None
+    pieces.append(raw[last:])
+    return b''.join(pieces)
 
 def process_file_simple(file_path: Path, timeout: int = DEFAULT_TIMEOUT):
     """Simpler approach: find }); after async tests and add timeout."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        raw = file_path.read_bytes()
         
-        # Check if already has timeouts
-        if 'timeout: Timeout(Duration(seconds:' in content:
+        # Cheap byte checks before any regex work: skip files without
+        # async tests and files that already have timeouts
+        if (b'async' not in raw or b'test' not in raw
+                or b'timeout: Timeout(Duration(seconds:' in raw):
             return False
         
-        # Find all async test patterns and their positions
-        async_pattern = r"test\s*\([^)]+\)\s*async\s*\{"
-        matches = list(re.finditer(async_pattern, content))
-        
-        if not matches:
+        new_raw = add_timeouts(raw, timeout)
+        if new_raw is None:
             return False
-        
-        # For each match, find the next }); that closes it
-        # We'll work backwards from the end to avoid position shifts
-        lines = content.split('\n')
-        modified = False
-        
-        # Simple heuristic: if a line has }); and the previous lines contain async test,
-        # add timeout if not present
-        for i in range(len(lines) - 1, -1, -1):
-            if '});' in lines[i] and 'timeout:' not in lines[i] and 'Timeout(' not in lines[i]:
-                # Check if there's an async test above this line
-                for j in range(max(0, i - 50), i):
-                    if re.search(r"test\s*\([^)]+\)\s*async", lines[j]):
-                        # Found async test, add timeout
-                        lines[i] = lines[i].replace(
-                            '});',
-                            f'}}, timeout: Timeout(Duration(seconds: {timeout})));'
-                        )
-                        modified = True
-                        break
-        
-        if modified:
-            new_content = '\n'.join(lines)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            return True
-        
-        return False
+        file_path.write_bytes(new_raw)
+        return True
         
     except Exception as e:
         print(f"  Error processing {file_path.name}: {e}")
         return False
 
+def _process_one(job):
+    """Run process_file_simple for a (path, timeout) job in a worker."""
+    path, timeout = job
+    return path.name, process_file_simple(path, timeout=timeout)
+
 def main():
     """Main function to process all test files."""
     test_dir = Path('test')
@@ -148,16 +188,27 @@ def main():
     print("Adding timeouts to async tests...")
     print()
     
+    # Files are independent, so large batches are split into one chunk per
+    # worker; small ones run in-process. Results are reported afterwards in
+    # sorted order
+    jobs = [
+        (f, NETWORK_TIMEOUT if f.name in network_test_files else DEFAULT_TIMEOUT)
+        for f in sorted(test_files)
+        if f.name not in processed_files
+    ]
+    workers = min(os.cpu_count() or 1, len(jobs) // MIN_FILES_PER_WORKER)
+    if workers <= 1:
+        results = dict(map(_process_one, jobs))
+    else:
+        chunksize = -(-len(jobs) // workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = dict(executor.map(_process_one, jobs, chunksize=chunksize))
+    
     modified_count = 0
     for test_file in sorted(test_files):
         if test_file.name in processed_files:
             print(f"  {test_file.name}: Already processed, skipping")
-            continue
-            
-        is_network_test = test_file.name in network_test_files
-        timeout = NETWORK_TIMEOUT if is_network_test else DEFAULT_TIMEOUT
-        
-        if process_file_simple(test_file, timeout=timeout):
+        elif results[test_file.name]:
             print(f"  {test_file.name}: Added timeouts")
             modified_count += 1
         else: